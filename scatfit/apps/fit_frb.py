@@ -7,7 +7,7 @@
 import argparse
 import copy
 import inspect
-import os.path
+import os
 import sys
 
 from astropy.time import Time, TimeDelta
@@ -20,6 +20,7 @@ from scatfit.dm import KDM, get_dm_smearing
 import scatfit.plotting as plotting
 import scatfit.pulsemodels as pulsemodels
 import scatfit.sigproc as sigproc
+import scatfit.stats as stats
 import scatfit.archive as archive
 
 
@@ -56,6 +57,14 @@ def parse_args():
         help="Fit an unscattered Gaussian model for comparison.",
     )
 
+    parser.add_argument(
+        "--corner",
+        dest="corner",
+        action="store_true",
+        default=False,
+        help="Generate corner plots of the posterior distributions. Only used with --mcmc.",
+    )
+
     parser.add_argument(
         "--binburst",
         dest="bin_burst",
@@ -101,6 +110,23 @@ def parse_args():
         help="Consider only this time range of data in the fit. Increase the region for wide or highly-scattered bursts. Ensure that most of the scattering tail is included in the fit.",
     )
 
+    parser.add_argument(
+        "--mcmc",
+        dest="mcmc",
+        action="store_true",
+        default=False,
+        help="Refine the fit and sample the posterior using MCMC. This is much slower and mainly needed for the corner plots and the numerical width posteriors.",
+    )
+
+    parser.add_argument(
+        "--mcmcsteps",
+        dest="mcmc_steps",
+        default=2400,
+        metavar="steps",
+        type=int,
+        help="Number of MCMC steps to run per sub-band. Only used with --mcmc.",
+    )
+
     parser.add_argument(
         "--fitscatindex",
         action="store_true",
@@ -261,7 +287,8 @@ def fit_powerlaw(x, y, err_y, params):
 
     print(fitresult_emcee.fit_report())
 
-    plotting.plot_corner(fitresult_emcee, "", False, params)
+    if params["corner"]:
+        plotting.plot_corner(fitresult_emcee, "", False, params)
 
     print(
         "Scattering index: {0:.2f} +- {1:.2f}".format(
@@ -350,7 +377,8 @@ def compute_updated_dm(t_df, dm, params):
 
     print(fitresult_emcee.fit_report())
 
-    plotting.plot_corner(fitresult_emcee, "", False, params)
+    if params["corner"]:
+        plotting.plot_corner(fitresult_emcee, "", False, params)
 
     delta_dm = fitresult_emcee.best_values["slope"]
     err_delta_dm = fitresult_emcee.params["slope"].stderr
@@ -364,11 +392,112 @@ def compute_updated_dm(t_df, dm, params):
     )
 
 
-def fit_profile_model(fit_range, profile, smodel, params):
+def profile_fit_jacobian(params, data, weights, x=None):
     """
-    Fit a profile model to data.
+    The analytic Jacobian of the profile fit residual, as expected by
+    the Levenberg-Marquardt minimiser.
+
+    Parameters
+    ----------
+    params: ~lmfit.Parameters
+        The current fit parameters.
+    data: ~np.array
+        The profile data.
+    weights: ~np.array or None
+        The fit weights.
+    x: ~np.array
+        The running variable (time).
+
+    Returns
+    -------
+    deriv: ~np.array
+        The partial derivatives of the residual with respect to the
+        varying fit parameters, one parameter per row.
+    """
+
+    values = params.valuesdict()
+
+    if "taud" in values:
+        jac = pulsemodels.gaussian_scattered_dfb_instrumental_jac(
+            x,
+            values["fluence"],
+            values["center"],
+            values["sigma"],
+            values["taus"],
+            values["taud"],
+            values["dc"],
+        )
+    else:
+        jac = pulsemodels.scattered_gaussian_pulse_jac(
+            x,
+            values["fluence"],
+            values["center"],
+            values["sigma"],
+            values["taus"],
+            values["dc"],
+        )
+
+    rows = {"fluence": 0, "center": 1, "sigma": 2, "taus": 3, "dc": 4}
+    var_names = [name for name in params if params[name].vary]
+
+    deriv = np.array([jac[rows[name]] for name in var_names])
+
+    if weights is not None:
+        deriv = deriv * weights
+
+    # the residual is (data - model) * weights
+    return -deriv
+
+
+# cache of configured lmfit models, keyed on the scattering model
+# name, plus the time grid and smearing time for the specialised dfb
+# model. constructing a model involves function signature introspection
+# and parameter hint processing that are identical for every sub-band
+_model_cache = {}
+
+
+def get_profile_model(smodel, fit_range=None, taud=None):
+    """
+    Get a configured lmfit model for the given scattering model.
+
+    The model object is cached and reused across sub-bands. Per-band
+    quantities, e.g. the dispersive smearing time, are set on the
+    parameters made from it instead. The dfb instrumental model is the
+    exception: when the time grid and smearing time are given, it is
+    specialised for them, with the normalised boxcar kernel baked in.
+
+    Parameters
+    ----------
+    smodel: str
+        The name of the scattering model to use.
+    fit_range: ~np.array, optional
+        The running variable (time) to specialise for.
+    taud: float, optional
+        The dispersive smearing time to specialise for.
+
+    Returns
+    -------
+    model: ~lmfit.Model
+        The configured fit model.
+
+    Raises
+    ------
+    NotImplementedError
+        If the scattering model is not implemented.
     """
 
+    specialise = smodel == "scattered_isotropic_dfb_instrumental" and (
+        fit_range is not None and taud is not None
+    )
+
+    if specialise:
+        key = (smodel, len(fit_range), fit_range[0], fit_range[-1], taud)
+    else:
+        key = smodel
+
+    if key in _model_cache:
+        return _model_cache[key]
+
     if smodel == "unscattered":
         scat_model = pulsemodels.gaussian_normed
     elif smodel == "scattered_isotropic_analytic":
@@ -380,7 +509,10 @@ def fit_profile_model(fit_range, profile, smodel, params):
     elif smodel == "scattered_isotropic_afb_instrumental":
         scat_model = pulsemodels.gaussian_scattered_afb_instrumental
     elif smodel == "scattered_isotropic_dfb_instrumental":
-        scat_model = pulsemodels.gaussian_scattered_dfb_instrumental
+        if specialise:
+            scat_model = pulsemodels.specialised_dfb_model(fit_range, taud)
+        else:
+            scat_model = pulsemodels.gaussian_scattered_dfb_instrumental
     else:
         raise NotImplementedError(
             "Scattering model not implemented: {0}".format(smodel)
@@ -406,30 +538,69 @@ def fit_profile_model(fit_range, profile, smodel, params):
         model.set_param_hint("taui", value=0.30624, vary=False)
 
     if "taud" in arg_list:
-        model.set_param_hint("taud", value=params["dm_smear"], vary=False)
+        model.set_param_hint("taud", value=0.0, vary=False)
 
     if "dc" in arg_list:
         model.set_param_hint("dc", value=0.0, min=-0.3, max=0.3)
 
     if "f_lo" in arg_list:
-        model.set_param_hint("f_lo", value=params["f_lo"], vary=False)
+        model.set_param_hint("f_lo", value=0.0, vary=False)
 
     if "f_hi" in arg_list:
-        model.set_param_hint("f_hi", value=params["f_hi"], vary=False)
+        model.set_param_hint("f_hi", value=0.0, vary=False)
 
     if "nfreq" in arg_list:
-        if params["fast"]:
-            model.set_param_hint("nfreq", value=3, vary=False)
-        else:
-            model.set_param_hint("nfreq", value=9, vary=False)
+        model.set_param_hint("nfreq", value=9, vary=False)
+
+    _model_cache[key] = model
+
+    return model
+
+
+def fit_profile_model(fit_range, profile, smodel, params):
+    """
+    Fit a profile model to data.
+    """
+
+    model = get_profile_model(smodel, fit_range=fit_range, taud=params["dm_smear"])
 
     fitparams = model.make_params()
 
+    # set the per-band fixed parameters
+    if "taud" in fitparams:
+        fitparams["taud"].set(value=params["dm_smear"])
+
+    if "f_lo" in fitparams:
+        fitparams["f_lo"].set(value=params["f_lo"])
+
+    if "f_hi" in fitparams:
+        fitparams["f_hi"].set(value=params["f_hi"])
+
+    if "nfreq" in fitparams:
+        if params["fast"]:
+            fitparams["nfreq"].set(value=3)
+        else:
+            fitparams["nfreq"].set(value=9)
+
     fitparams.add("w50i", expr="2.3548200*sigma")
     fitparams.add("w10i", expr="4.2919320*sigma")
 
+    # provide the analytic jacobian where we have one, which saves the
+    # finite-difference model evaluations per minimiser step
+    if smodel in (
+        "scattered_isotropic_analytic",
+        "scattered_isotropic_dfb_instrumental",
+    ):
+        ml_fit_kws = {"Dfun": profile_fit_jacobian, "col_deriv": 1}
+    else:
+        ml_fit_kws = None
+
     fitresult_ml = model.fit(
-        data=profile, x=fit_range, params=fitparams, method="leastsq"
+        data=profile,
+        x=fit_range,
+        params=fitparams,
+        method="leastsq",
+        fit_kws=ml_fit_kws,
     )
 
     if not fitresult_ml.success:
@@ -437,8 +608,25 @@ def fit_profile_model(fit_range, profile, smodel, params):
 
     print(fitresult_ml.fit_report())
 
-    # 100 * (5000 - 1000)/10 = 40k samples
-    emcee_kws = dict(steps=5000, burn=1000, thin=10, is_weighted=False, progress=True)
+    # the maximum-likelihood fit already provides the point estimates
+    # and standard errors. only sample the posterior when requested
+    if not params["mcmc"]:
+        return fitresult_ml
+
+    # with the defaults, 100 * (2400 - 300)/10 = 21k samples
+    # the posterior is near-gaussian in only a handful of parameters,
+    # so this samples it sufficiently. propagate the walkers in
+    # parallel across all cpu cores
+    steps = params["mcmc_steps"]
+
+    emcee_kws = dict(
+        steps=steps,
+        burn=max(100, steps // 8),
+        thin=10,
+        is_weighted=False,
+        progress=True,
+        workers=os.cpu_count(),
+    )
 
     if params["fast"]:
         # 100 * (300 - 100)/2 = 10k samples
@@ -460,15 +648,22 @@ def fit_profile_model(fit_range, profile, smodel, params):
     print(fitresult_emcee.fit_report())
 
     plotting.plot_chains(fitresult_emcee)
-    plotting.plot_corner(fitresult_emcee, smodel, True, params)
+
+    # the pair plot is expensive to draw, only do so on demand
+    if params["corner"]:
+        plotting.plot_corner(fitresult_emcee, smodel, True, params)
 
     return fitresult_emcee
 
 
 def compute_post_widths(fit_range, t_fitresult):
     """
-    Compute the full post-scattering widths numerically
-    from the Markov chain samples.
+    Compute the full post-scattering widths numerically.
+
+    If the fit result comes from an MCMC run, the widths and their
+    uncertainties are estimated from the Markov chain samples.
+    Otherwise, only point estimates from the best-fitting model are
+    computed.
     """
 
     fitresult = copy.deepcopy(t_fitresult)
@@ -478,10 +673,33 @@ def compute_post_widths(fit_range, t_fitresult):
         np.min(fit_range), np.max(fit_range), num=4 * len(fit_range)
     )
 
+    if fitresult.method != "emcee":
+        amps = fitresult.eval(x=dense_range)
+
+        widths = {
+            "weq": {
+                "value": pulsemodels.equivalent_width(dense_range, amps),
+                "error": np.nan,
+            },
+            "w50p": {
+                "value": pulsemodels.full_width_post(dense_range, amps, 0.5),
+                "error": np.nan,
+            },
+            "w10p": {
+                "value": pulsemodels.full_width_post(dense_range, amps, 0.1),
+                "error": np.nan,
+            },
+        }
+
+        return widths
+
     samples = fitresult.flatchain
     params = fitresult.params.copy()
 
-    df = pd.DataFrame(columns=["weq", "w50p", "w10p"])
+    # accumulate the rows in a plain list and construct the dataframe
+    # in one go at the end. concatenating incrementally copies the
+    # whole frame on every iteration
+    rows = []
 
     for idx in range(len(samples)):
         for field in samples.columns:
@@ -493,12 +711,9 @@ def compute_post_widths(fit_range, t_fitresult):
         w50_post = pulsemodels.full_width_post(dense_range, amps, 0.5)
         w10_post = pulsemodels.full_width_post(dense_range, amps, 0.1)
 
-        temp = pd.DataFrame(
-            {"weq": weq_post, "w50p": w50_post, "w10p": w10_post},
-            index=[idx],
-        )
+        rows.append({"weq": weq_post, "w50p": w50_post, "w10p": w10_post})
 
-        df = pd.concat([df, temp], ignore_index=True)
+    df = pd.DataFrame(rows, columns=["weq", "w50p", "w10p"])
 
     # convert object to numeric
     df = df.apply(pd.to_numeric)
@@ -522,48 +737,61 @@ def fit_profile(cand, plot_range, fscrunch_factor, smodel, params):
     Fit an FRB profile.
     """
 
-    df = pd.DataFrame(
-        columns=[
-            "band",
-            "cfreq",
-            "fluence",
-            "err_fluence",
-            "center",
-            "err_center",
-            "sigma",
-            "err_sigma",
-            "weq",
-            "err_weq",
-            "w50p",
-            "err_w50p",
-            "w10p",
-            "err_w10p",
-        ]
+    columns = [
+        "band",
+        "cfreq",
+        "fluence",
+        "err_fluence",
+        "center",
+        "err_center",
+        "sigma",
+        "err_sigma",
+        "weq",
+        "err_weq",
+        "w50p",
+        "err_w50p",
+        "w10p",
+        "err_w10p",
+    ]
+
+    # accumulate the per-band rows in a plain list and construct the
+    # dataframe in one go at the end, which avoids copying the whole
+    # frame on every iteration
+    rows = []
+
+    # make sure the per-band row access below streams over contiguous
+    # memory. this is a no-op if the dynamic spectrum is laid out in
+    # (nchan, ntime) order already
+    dynspec = np.ascontiguousarray(cand.dynspec)
+
+    # select only this time range of data for the fit
+    # the time grid is identical for all sub-bands
+    fit_mask = (plot_range >= params["fitrange"][0]) & (
+        plot_range <= params["fitrange"][1]
     )
+    fit_range = np.copy(plot_range[fit_mask])
+
+    # the baseline mask and the channel bandwidth are identical for all
+    # sub-bands too, so compute them once
+    # XXX: we should adjust the baseline region based on the actual
+    # pulse width
+    baseline_mask = np.abs(fit_range) > 30.0
+    chan_bw = np.abs(cand.freqs[1] - cand.freqs[0])
 
     fitresults = []
-    for iband in range(cand.dynspec.shape[0]):
+    for iband in range(dynspec.shape[0]):
         print("\nRunning sub-band: {0}".format(iband))
 
-        sub_profile = cand.dynspec[iband, :]
-
-        # select only this time range of data for the fit
-        mask = (plot_range >= params["fitrange"][0]) & (
-            plot_range <= params["fitrange"][1]
-        )
-        fit_range = np.copy(plot_range[mask])
-        sub_profile = sub_profile[mask]
+        sub_profile = dynspec[iband, fit_mask]
 
         # remove baseline and normalise
         sub_profile = sub_profile - np.mean(sub_profile)
         sub_profile = sub_profile / np.max(sub_profile)
 
         # compute baseline statistics outside the central +- 30 ms
-        # XXX: we should adjust this based on the actual pulse width
-        mask = np.abs(fit_range) > 30.0
-        quantiles = np.quantile(sub_profile[mask], q=[0.25, 0.75], axis=None)
+        quantiles = stats.fast_quantiles(sub_profile[baseline_mask], [0.25, 0.75])
         std = 0.7413 * np.abs(quantiles[1] - quantiles[0])
-        snr = np.max(sub_profile[~mask]) / std
+        snr = np.max(sub_profile[~baseline_mask]) / std
         print("S/N: {0:.2f}".format(snr))
 
         if not snr >= params["snr"]:
@@ -575,7 +803,6 @@ def fit_profile(cand, plot_range, fscrunch_factor, smodel, params):
         f_hi = cand.freqs[idx_hi]
         f_lo = cand.freqs[idx_lo]
         cfreq = 0.5 * (f_hi + f_lo)
-        chan_bw = np.abs(np.diff(cand.freqs))[0]
 
         dm_smear = get_dm_smearing(
             cfreq - 0.5 * chan_bw, cfreq + 0.5 * chan_bw, cand.dm
@@ -610,34 +837,36 @@ def fit_profile(cand, plot_range, fscrunch_factor, smodel, params):
         # compute profile statistics
         widths_post = compute_post_widths(fit_range, fitresult)
 
-        temp = pd.DataFrame(
-            {
-                "band": iband,
-                "cfreq": cfreq,
-                "fluence": fitresult.best_values["fluence"],
-                "err_fluence": fitresult.params["fluence"].stderr,
-                "center": fitresult.best_values["center"],
-                "err_center": fitresult.params["center"].stderr,
-                "sigma": fitresult.best_values["sigma"],
-                "err_sigma": fitresult.params["sigma"].stderr,
-                "weq": widths_post["weq"]["value"],
-                "err_weq": widths_post["weq"]["error"],
-                "w50p": widths_post["w50p"]["value"],
-                "err_w50p": widths_post["w50p"]["error"],
-                "w10p": widths_post["w10p"]["value"],
-                "err_w10p": widths_post["w10p"]["error"],
-            },
-            index=[iband],
-        )
+        row = {
+            "band": iband,
+            "cfreq": cfreq,
+            "fluence": fitresult.best_values["fluence"],
+            "err_fluence": fitresult.params["fluence"].stderr,
+            "center": fitresult.best_values["center"],
+            "err_center": fitresult.params["center"].stderr,
+            "sigma": fitresult.best_values["sigma"],
+            "err_sigma": fitresult.params["sigma"].stderr,
+            "weq": widths_post["weq"]["value"],
+            "err_weq": widths_post["weq"]["error"],
+            "w50p": widths_post["w50p"]["value"],
+            "err_w50p": widths_post["w50p"]["error"],
+            "w10p": widths_post["w10p"]["value"],
+            "err_w10p": widths_post["w10p"]["error"],
+        }
 
         if "taus" in fitresult.best_values:
-            temp["taus"] = fitresult.best_values["taus"]
-            temp["err_taus"] = fitresult.params["taus"].stderr
+            row["taus"] = fitresult.best_values["taus"]
+            row["err_taus"] = fitresult.params["taus"].stderr
 
         if "taud" in fitresult.best_values:
-            temp["taud"] = fitresult.best_values["taud"]
+            row["taud"] = fitresult.best_values["taud"]
 
-        df = pd.concat([df, temp], ignore_index=True)
+        rows.append(row)
+
+    if rows:
+        df = pd.DataFrame(rows)
+    else:
+        df = pd.DataFrame(columns=columns)
 
     # convert object to numeric
     df = df.apply(pd.to_numeric)
@@ -700,8 +929,11 @@ def main():
 
     params = {
         "compare": args.compare,
+        "corner": args.corner,
         "fast": args.fast,
         "fitrange": args.fitrange,
+        "mcmc": args.mcmc,
+        "mcmc_steps": args.mcmc_steps,
         "publish": args.publish,
         "snr": args.snr,
         "zoom": args.zoom,
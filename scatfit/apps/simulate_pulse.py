@@ -150,8 +150,8 @@ class Pulse(object):
         fig = plt.figure()
         ax = fig.add_subplot()
 
-        time_step = np.diff(self.times)[0]
-        freq_step = np.diff(self.freqs)[0]
+        time_step = self.times[1] - self.times[0]
+        freq_step = self.freqs[1] - self.freqs[0]
 
         ax.imshow(
             data,
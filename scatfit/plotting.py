@@ -13,6 +13,7 @@ from lmfit import Model
 
 from scatfit.dm import get_dm_smearing
 import scatfit.pulsemodels as pulsemodels
+import scatfit.stats as stats
 
 
 def use_custom_matplotlib_formatting():
@@ -66,12 +67,11 @@ def plot_frb(cand, plot_range, profile, params):
 
     # plot dedispersed waterfall
     freqs = cand.freqs
-    chan_bw = np.diff(freqs)[0]
+    chan_bw = freqs[1] - freqs[0]
 
-    quantiles = np.quantile(
-        cand.dynspec,
-        q=[0.05, 0.1, 0.25, 0.3, 0.4, 0.5, 0.75, 0.8, 0.95, 0.97, 0.98, 0.99],
-    )
+    # the colour scale limits only need approximate quantiles, so
+    # subsample the waterfall and use a partial sort
+    quantiles = stats.fast_quantiles(cand.dynspec.ravel()[::8], [0.05, 0.95])
 
     ax2.imshow(
         cand.dynspec,
@@ -85,7 +85,7 @@ def plot_frb(cand, plot_range, profile, params):
         ],
         cmap="Greys",
         vmin=quantiles[0],
-        vmax=quantiles[-4],
+        vmax=quantiles[1],
         zorder=3,
     )
 
@@ -191,7 +191,10 @@ def plot_frb_scat(
         axw = fig.add_subplot(gs[1])
 
         freqs = cand.freqs
-        chan_bw = np.diff(freqs)[0]
+        chan_bw = freqs[1] - freqs[0]
+
+        # the colour scale limits only need approximate quantiles
+        scale_quantiles = stats.fast_quantiles(cand.dynspec, [0.001, 0.999])
 
         axw.imshow(
             cand.dynspec,
@@ -204,8 +207,8 @@ def plot_frb_scat(
                 freqs[0] + 0.5 * chan_bw,
             ],
             cmap=cmap2,
-            vmin=np.percentile(cand.dynspec, 0.1),
-            vmax=np.percentile(cand.dynspec, 99.9),
+            vmin=scale_quantiles[0],
+            vmax=scale_quantiles[1],
         )
 
         axw.set_xlim(left=params["zoom"][0], right=params["zoom"][1])
@@ -429,7 +432,7 @@ def plot_width_scaling(t_df, cand, fitresult):
     df = t_df.copy()
 
     freqs = cand.freqs
-    chan_bw = np.diff(freqs)[0]
+    chan_bw = freqs[1] - freqs[0]
 
     fig = plt.figure()
     ax = fig.add_subplot()
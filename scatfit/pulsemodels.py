@@ -4,22 +4,46 @@
 #
 
 import numpy as np
-from scipy import signal
+from scipy import signal, special
 
 try:
-    from scatfit.pulsemodels_cython import (
+    from scatfit.pulsemodels_numba import (
         gaussian_normed,
         scattered_gaussian_pulse,
         bandintegrated_model,
     )
 except ImportError:
-    print(
-        "Could not import Cython pulse model implementations. Falling back to the Python versions."
+    try:
+        from scatfit.pulsemodels_cython import (
+            gaussian_normed,
+            scattered_gaussian_pulse,
+            bandintegrated_model,
+        )
+    except ImportError:
+        print(
+            "Could not import the Numba or Cython pulse model implementations. Falling back to the Python versions."
+        )
+        from scatfit.pulsemodels_python import (
+            gaussian_normed,
+            scattered_gaussian_pulse,
+            bandintegrated_model,
+        )
+
+# the cython backend does not implement these small kernels, so fall
+# back to the python versions silently
+try:
+    from scatfit.pulsemodels_numba import (
+        boxcar_fill,
+        equivalent_width,
+        full_width_post,
+        pbf_isotropic_fill,
     )
+except ImportError:
     from scatfit.pulsemodels_python import (
-        gaussian_normed,
-        scattered_gaussian_pulse,
-        bandintegrated_model,
+        boxcar_fill,
+        equivalent_width,
+        full_width_post,
+        pbf_isotropic_fill,
     )
 
 
@@ -99,14 +123,65 @@ def boxcar(x, width):
         The boxcar data.
     """
 
-    res = np.zeros(len(x))
-
-    mask = np.abs(x) <= 0.5 * width
-    res[mask] = 1.0
+    res = boxcar_fill(x, width)
 
     return res
 
 
+# cache of normalised boxcar kernels, keyed on the time grid and the
+# boxcar width. both stay constant across the thousands of model
+# evaluations of a fit, as taud does not vary
+_boxcar_cache = {}
+
+
+def _normalised_boxcar(x, width):
+    """
+    Get the normalised boxcar kernel, trimmed to its non-zero support.
+
+    The kernel is memoised, as rebuilding and normalising it on every
+    model evaluation is redundant for a fixed time grid and width.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    width: float
+        The width of the boxcar function.
+
+    Returns
+    -------
+    kernel: ~np.array
+        The normalised boxcar kernel.
+    start: int
+        The offset into the full convolution of the data with `kernel`
+        that matches a mode='same' convolution with the full-length
+        boxcar, or -1 if the full-length kernel must be used.
+    """
+
+    key = (len(x), float(x[0]), float(x[-1]), float(width))
+
+    if key not in _boxcar_cache:
+        B = boxcar(x, width)
+
+        # the boxcar has only a short non-zero support (typically tens
+        # of samples), so trim it and let scipy pick a direct
+        # convolution, which is cheaper than an fft-based one on the
+        # full-length arrays
+        support = np.flatnonzero(B)
+        start = (len(x) - 1) // 2 - support[0] if support.size > 0 else -1
+
+        if 0 < support.size < len(x) and 0 <= start < support[-1] - support[0] + 1:
+            kernel = B[support[0] : support[-1] + 1] / np.sum(B)
+        else:
+            kernel = B / np.sum(B)
+            start = -1
+
+        kernel.setflags(write=False)
+        _boxcar_cache[key] = (kernel, start)
+
+    return _boxcar_cache[key]
+
+
 def gaussian_scattered_dfb_instrumental(x, fluence, center, sigma, taus, taud, dc):
     """
     A Gaussian pulse scattered in the ISM and affected by digital (boxcar-like) instrumental effects.
@@ -139,105 +214,326 @@ def gaussian_scattered_dfb_instrumental(x, fluence, center, sigma, taus, taud, d
 
     A = scattered_profile(x, fluence, center, sigma, taus, 0.0)
 
-    B = boxcar(x, taud)
+    kernel, start = _normalised_boxcar(x, taud)
+
+    if start >= 0:
+        conv = signal.convolve(A, kernel, mode="full", method="auto")[
+            start : start + len(x)
+        ]
+    else:
+        conv = signal.convolve(A, kernel, mode="same", method="auto")
 
-    res = dc + signal.oaconvolve(A, B, mode="same") / np.sum(B)
+    res = dc + conv
 
     return res
 
 
-def gaussian_fwhm(sigma):
+class _SpecialisedDfbModel:
     """
-    The full width at half maximum (W50) of a Gaussian.
+    A runtime-specialised version of `gaussian_scattered_dfb_instrumental`.
+
+    The time grid and the dispersive smearing time are fixed within the
+    fit of one sub-band, so the trimmed and normalised boxcar kernel is
+    a constant there. We bake it in at construction time, which removes
+    the kernel lookup from every model evaluation.
+
+    Instances are callable with the same signature as
+    `gaussian_scattered_dfb_instrumental`, so they can be used as a
+    drop-in lmfit model function. The `taud` argument is retained for
+    signature compatibility, but the baked-in kernel is used. Instances
+    are picklable, i.e. they work with parallel posterior sampling.
+    """
+
+    def __init__(self, x, taud):
+        self.__name__ = "gaussian_scattered_dfb_instrumental"
+        self.taud = float(taud)
+        self.kernel, self.start = _normalised_boxcar(x, taud)
+
+    def __call__(self, x, fluence, center, sigma, taus, taud, dc):
+        A = scattered_profile(x, fluence, center, sigma, taus, 0.0)
+
+        if self.start >= 0:
+            conv = signal.convolve(A, self.kernel, mode="full", method="auto")[
+                self.start : self.start + len(x)
+            ]
+        else:
+            conv = signal.convolve(A, self.kernel, mode="same", method="auto")
+
+        res = dc + conv
+
+        return res
+
+
+# cache of specialised dfb model instances, keyed like the boxcar
+# kernels, so that reruns on the same grid reuse the same instance
+_specialised_dfb_cache = {}
+
+
+def specialised_dfb_model(x, taud):
+    """
+    Get a `gaussian_scattered_dfb_instrumental` model specialised for a
+    fixed time grid and dispersive smearing time.
 
     Parameters
     ----------
-    sigma: float
-        The Gaussian standard deviation.
+    x: ~np.array
+        The running variable (time).
+    taud: float
+        The scattering time due to intra-channel dispersive smearing.
 
     Returns
     -------
-    res: float
-        The Gaussian W50.
+    model: _SpecialisedDfbModel
+        The specialised model instance.
     """
 
-    res = 2.0 * np.sqrt(2.0 * np.log(2.0)) * sigma
+    key = (len(x), float(x[0]), float(x[-1]), float(taud))
 
-    return res
+    if key not in _specialised_dfb_cache:
+        _specialised_dfb_cache[key] = _SpecialisedDfbModel(x, taud)
 
+    return _specialised_dfb_cache[key]
 
-def gaussian_fwtm(sigma):
+
+def scattered_gaussian_pulse_jac(x, fluence, center, sigma, taus, dc):
     """
-    The full width at tenth maximum (W10) of a Gaussian.
+    The partial derivatives of `scattered_gaussian_pulse` with respect
+    to its model parameters.
 
     Parameters
     ----------
+    x: ~np.array
+        The running variable (time).
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
     sigma: float
         The Gaussian standard deviation.
+    taus: float
+        The scattering time.
+    dc: float
+        The vertical offset of the profile from the baseline.
 
     Returns
     -------
-    res: float
-        The Gaussian W10.
+    jac: ~np.array
+        The partial derivatives of the profile data with respect to
+        (fluence, center, sigma, taus, dc), of shape (5, len(x)).
     """
 
-    res = 2.0 * np.sqrt(2.0 * np.log(10.0)) * sigma
+    invsigma = 1.0 / sigma
+    K = taus * invsigma
+    invK = 1.0 / K
+    invsqrt = 1.0 / np.sqrt(2.0)
 
-    return res
+    jac = np.empty(shape=(5, len(x)))
+
+    if invK >= 10.0:
+        # the model degenerates into a regular gaussian here
+        mu_gauss = center + taus
+        gauss = gaussian_normed(x, fluence, mu_gauss, sigma)
+        y = (x - mu_gauss) * invsigma
+
+        jac[0] = gauss / fluence
+        jac[1] = gauss * y * invsigma
+        jac[2] = gauss * (np.power(y, 2) - 1.0) * invsigma
+        jac[3] = jac[1]
+        jac[4] = 1.0
+    else:
+        y = (x - center) * invsigma
+        argexp = 0.5 * invK**2 - y * invK
 
+        # prevent numerical overflows, as in the forward model
+        mask = argexp >= 300.0
+        argexp[mask] = 0.0
+
+        prefac = 0.5 * invK * invsigma
+        expfac = np.exp(argexp)
+        z = (invK - y) * invsqrt
+        erfcfac = special.erfc(z)
+        # d erfc(z) / dz = -2/sqrt(pi) * exp(-z^2)
+        gaussfac = (2.0 / np.sqrt(np.pi)) * np.exp(-np.power(z, 2))
+
+        exgaussian = prefac * expfac * erfcfac
+
+        jac[0] = exgaussian
+        jac[1] = (
+            fluence * prefac * expfac * invsigma * (invK * erfcfac - gaussfac * invsqrt)
+        )
+        jac[2] = (
+            fluence
+            * prefac
+            * expfac
+            * invsigma
+            * (invK**2 * erfcfac - (y + invK) * gaussfac * invsqrt)
+        )
+        jac[3] = -(fluence / taus) * (
+            exgaussian
+            + invK * prefac * expfac * ((invK - y) * erfcfac - gaussfac * invsqrt)
+        )
+        jac[4] = 1.0
 
-def equivalent_width(x, amp):
+    return jac
+
+
+def scattered_profile_jac(x, fluence, center, sigma, taus, dc):
     """
-    Compute the boxcar equivalent width.
+    The partial derivatives of `scattered_profile` with respect to its
+    model parameters.
+
+    As the convolution is linear, it commutes with the derivatives. We
+    therefore convolve the closed-form partials of the Gaussian and the
+    pulse broadening function, which makes the Jacobian exact for the
+    discretely sampled convolution model.
 
     Parameters
     ----------
     x: ~np.array
         The running variable (time).
-    amp: ~np.array
-        The pulse amplitude.
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
+    sigma: float
+        The Gaussian standard deviation.
+    taus: float
+        The scattering time.
+    dc: float
+        The vertical offset of the profile from the baseline.
 
     Returns
     -------
-    weq: float
-        The equivalent width.
+    jac: ~np.array
+        The partial derivatives of the profile data with respect to
+        (fluence, center, sigma, taus, dc), of shape (5, len(x)).
     """
 
-    mask = amp >= 0
-    fluxsum = np.sum(amp[mask]) * np.abs(x[0] - x[1])
-    weq = fluxsum / np.max(amp)
+    invsigma = 1.0 / sigma
+
+    A = gaussian_normed(x, fluence, center, sigma)
+    y = (x - center) * invsigma
+
+    B = pbf_isotropic(x, taus)
+    B_taus = pbf_isotropic_taus_derivative(x, taus)
+
+    sum_B = np.sum(B)
+    sum_B_taus = np.sum(B_taus)
+
+    def convolve_normed(data):
+        return signal.convolve(data, B, mode="same", method="auto") / sum_B
+
+    scattered = convolve_normed(A)
+
+    jac = np.empty(shape=(5, len(x)))
+
+    jac[0] = scattered / fluence
+    jac[1] = convolve_normed(A * y * invsigma)
+    jac[2] = convolve_normed(A * (np.power(y, 2) - 1.0) * invsigma)
+    # quotient rule for the derivative of the kernel normalisation
+    jac[3] = (
+        signal.convolve(A, B_taus, mode="same", method="auto") / sum_B
+        - scattered * sum_B_taus / sum_B
+    )
+    jac[4] = 1.0
 
-    return weq
+    return jac
 
 
-def full_width_post(x, amp, level):
+def gaussian_scattered_dfb_instrumental_jac(x, fluence, center, sigma, taus, taud, dc):
     """
-    Compute the full pulse width post scattering numerically.
+    The partial derivatives of `gaussian_scattered_dfb_instrumental`
+    with respect to its varying model parameters.
+
+    We convolve the partials of the scattered profile with the
+    normalised boxcar kernel, which is exact, as the convolution is
+    linear and commutes with the derivatives.
 
     Parameters
     ----------
     x: ~np.array
         The running variable (time).
-    amp: ~np.array
-        The pulse amplitude.
-    level: float
-        The level at which to evaluate the pulse width.
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
+    sigma: float
+        The Gaussian standard deviation.
+    taus: float
+        The scattering time in the ISM.
+    taud: float
+        The scattering time due to intra-channel dispersive smearing.
+    dc: float
+        The vertical offset of the profile from the baseline.
 
     Returns
     -------
-    width: float
-        The full pulse width at the given level.
+    jac: ~np.array
+        The partial derivatives of the profile data with respect to
+        (fluence, center, sigma, taus, dc), of shape (5, len(x)).
     """
 
-    mask = amp >= level * np.max(amp)
+    jac = scattered_profile_jac(x, fluence, center, sigma, taus, dc)
 
-    # treat special case when pulse is only one sample wide
-    if len(x[mask]) > 1:
-        width = np.abs(np.max(x[mask]) - np.min(x[mask]))
-    else:
-        width = np.abs(x[0] - x[1])
+    kernel, start = _normalised_boxcar(x, taud)
+
+    # the dc partial is constant and unaffected by the normalised
+    # convolution, so smear out the others only
+    for i in range(4):
+        if start >= 0:
+            jac[i] = signal.convolve(jac[i], kernel, mode="full", method="auto")[
+                start : start + len(x)
+            ]
+        else:
+            jac[i] = signal.convolve(jac[i], kernel, mode="same", method="auto")
+
+    return jac
+
+
+# conversion factors from the standard deviation of a Gaussian to its
+# full width at half and tenth maximum, computed once at import time
+_FWHM_FACTOR = 2.0 * np.sqrt(2.0 * np.log(2.0))
+_FWTM_FACTOR = 2.0 * np.sqrt(2.0 * np.log(10.0))
+
+
+def gaussian_fwhm(sigma):
+    """
+    The full width at half maximum (W50) of a Gaussian.
+
+    Parameters
+    ----------
+    sigma: float
+        The Gaussian standard deviation.
+
+    Returns
+    -------
+    res: float
+        The Gaussian W50.
+    """
 
-    return width
+    res = _FWHM_FACTOR * sigma
+
+    return res
+
+
+def gaussian_fwtm(sigma):
+    """
+    The full width at tenth maximum (W10) of a Gaussian.
+
+    Parameters
+    ----------
+    sigma: float
+        The Gaussian standard deviation.
+
+    Returns
+    -------
+    res: float
+        The Gaussian W10.
+    """
+
+    res = _FWTM_FACTOR * sigma
+
+    return res
 
 
 def pbf_isotropic(plot_range, taus):
@@ -282,12 +578,43 @@ def pbf_isotropic(plot_range, taus):
             "The window array is too short: {0}, {1}".format(np.max(x), t0)
         )
 
+    res = pbf_isotropic_fill(x, taus)
+
+    return res
+
+
+def pbf_isotropic_taus_derivative(plot_range, taus):
+    """
+    The partial derivative of `pbf_isotropic` with respect to the
+    scattering time.
+
+    Parameters
+    ----------
+    plot_range: ~np.array
+        The evaluation variable (time) in ms.
+    taus: float
+        The scattering time in ms.
+
+    Returns
+    -------
+    res: ~np.array
+        The profile data.
+    """
+
+    N = len(plot_range)
+    tsamp = np.abs(plot_range[0] - plot_range[1])
+
+    x = np.arange(N) * tsamp
+    x -= x[N // 2]
+
     res = np.zeros(len(x))
 
     invtaus = 1.0 / taus
 
     mask = x >= 0.0
-    res[mask] = invtaus * np.exp(-x[mask] * invtaus)
+    res[mask] = (
+        np.power(invtaus, 2) * (x[mask] * invtaus - 1.0) * np.exp(-x[mask] * invtaus)
+    )
 
     return res
 
@@ -321,6 +648,6 @@ def scattered_profile(x, fluence, center, sigma, taus, dc):
 
     B = pbf_isotropic(x, taus)
 
-    scattered = dc + signal.oaconvolve(A, B, mode="same") / np.sum(B)
+    scattered = dc + signal.convolve(A, B, mode="same", method="auto") / np.sum(B)
 
     return scattered
@@ -0,0 +1,352 @@
+#
+#   Pulse models implemented using Numba.
+#   2026 Fabian Jankowski
+#
+
+import math
+
+import numpy as np
+from numba import njit
+
+
+@njit(fastmath=True, cache=True)
+def gaussian_normed(x, fluence, center, sigma):
+    """
+    A normed Gaussian function.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
+    sigma: float
+        The Gaussian standard deviation.
+
+    Returns
+    -------
+    res: ~np.array
+        The profile data, in the dtype of `x`.
+    """
+
+    invsigma = 1.0 / sigma
+    invsqrt = 1.0 / math.sqrt(2.0 * math.pi)
+    A = fluence * invsigma * invsqrt
+
+    res = np.empty_like(x)
+
+    for i in range(x.size):
+        res[i] = A * math.exp(-0.5 * ((x[i] - center) * invsigma) ** 2)
+
+    return res
+
+
+@njit(fastmath=True, cache=True)
+def scattered_gaussian_pulse(x, fluence, center, sigma, taus, dc):
+    """
+    A scattered Gaussian pulse. Analytical approach, assuming thin screen scattering.
+
+    We use a standard implementation of an exponentially modified Gaussian here, see
+    https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.exponnorm.html
+
+    The elementwise kernel is fused into a single loop with one output
+    allocation, i.e. no intermediate arrays are created.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
+    sigma: float
+        The Gaussian standard deviation.
+    taus: float
+        The scattering time.
+    dc: float
+        The vertical offset of the profile from the baseline.
+
+    Returns
+    -------
+    res: ~np.array
+        The profile data, in the dtype of `x`.
+    """
+
+    # treat the following special cases
+    # 1) invK >> 1, i.e. sigma >> taus
+    # -> function becomes a regular gaussian
+
+    invsigma = 1.0 / sigma
+    K = taus * invsigma
+    invK = 1.0 / K
+    invsqrt = 1.0 / math.sqrt(2.0)
+
+    res = np.empty_like(x)
+
+    if invK >= 10.0:
+        mu_gauss = center + taus
+        gauss = gaussian_normed(x, fluence, mu_gauss, sigma)
+
+        for i in range(x.size):
+            res[i] = dc + gauss[i]
+    else:
+        for i in range(x.size):
+            y = (x[i] - center) * invsigma
+            argexp = 0.5 * invK * invK - y * invK
+
+            # prevent numerical overflows
+            if argexp >= 300.0:
+                argexp = 0.0
+
+            exgaussian = (
+                0.5
+                * invK
+                * invsigma
+                * math.exp(argexp)
+                * math.erfc(-(y - invK) * invsqrt)
+            )
+
+            res[i] = dc + fluence * exgaussian
+
+    return res
+
+
+@njit(fastmath=True, cache=True)
+def boxcar_fill(x, width):
+    """
+    A simple boxcar function.
+
+    This writes every output sample in a single pass, i.e. without an
+    intermediate boolean mask array.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    width: float
+        The width of the boxcar function.
+
+    Returns
+    -------
+    res: ~np.array
+        The boxcar data.
+    """
+
+    half_width = 0.5 * width
+
+    res = np.empty_like(x)
+
+    for i in range(x.size):
+        if abs(x[i]) <= half_width:
+            res[i] = 1.0
+        else:
+            res[i] = 0.0
+
+    return res
+
+
+@njit(fastmath=True, cache=True)
+def equivalent_width(x, amp):
+    """
+    Compute the boxcar equivalent width.
+
+    The sum over the positive samples and the profile maximum are
+    tracked in a single pass, i.e. without mask or temporary arrays.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    amp: ~np.array
+        The pulse amplitude.
+
+    Returns
+    -------
+    weq: float
+        The equivalent width.
+    """
+
+    maxamp = amp[0]
+    fluxsum = 0.0
+
+    for i in range(amp.size):
+        if amp[i] > maxamp:
+            maxamp = amp[i]
+        if amp[i] >= 0.0:
+            fluxsum = fluxsum + amp[i]
+
+    weq = fluxsum * abs(x[0] - x[1]) / maxamp
+
+    return weq
+
+
+@njit(fastmath=True, cache=True)
+def full_width_post(x, amp, level):
+    """
+    Compute the full pulse width post scattering numerically.
+
+    The running minimum and maximum of the time samples above the
+    threshold are tracked directly, i.e. without mask or temporary
+    arrays.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    amp: ~np.array
+        The pulse amplitude.
+    level: float
+        The level at which to evaluate the pulse width.
+
+    Returns
+    -------
+    width: float
+        The full pulse width at the given level.
+    """
+
+    maxamp = amp[0]
+
+    for i in range(amp.size):
+        if amp[i] > maxamp:
+            maxamp = amp[i]
+
+    thresh = level * maxamp
+
+    lo = np.inf
+    hi = -np.inf
+    nabove = 0
+
+    for i in range(amp.size):
+        if amp[i] >= thresh:
+            nabove = nabove + 1
+            if x[i] < lo:
+                lo = x[i]
+            if x[i] > hi:
+                hi = x[i]
+
+    # treat special case when pulse is only one sample wide
+    if nabove > 1:
+        width = abs(hi - lo)
+    else:
+        width = abs(x[0] - x[1])
+
+    return width
+
+
+@njit(fastmath=True, cache=True)
+def pbf_isotropic_fill(x, taus):
+    """
+    The elementwise kernel of the pulse broadening function for
+    isotropic scattering.
+
+    This writes every output sample in a single pass, i.e. without an
+    intermediate boolean mask array.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time), centred on zero.
+    taus: float
+        The scattering time.
+
+    Returns
+    -------
+    res: ~np.array
+        The profile data.
+    """
+
+    invtaus = 1.0 / taus
+
+    res = np.empty_like(x)
+
+    for i in range(x.size):
+        if x[i] >= 0.0:
+            res[i] = invtaus * math.exp(-x[i] * invtaus)
+        else:
+            res[i] = 0.0
+
+    return res
+
+
+@njit(fastmath=True, cache=True)
+def bandintegrated_model(x, fluence, center, sigma, taus, dc, f_lo, f_hi, nfreq):
+    """
+    A true frequency band-integrated profile model.
+
+    The total (sub-)band-integrated profile is the superposition (weighted sum or
+    weighted mean) of several profiles that evolve with frequency across the bandwidth
+    of the frequency (sub-)band, one for each frequency channel. Namely, the individual
+    profiles evolve with frequency (scattering, pulse width, fluence). For large
+    fractional bandwidths or at low frequencies (< 1 GHz), the profile evolution across
+    the band cannot be neglected, i.e. the narrow-band approximation fails.
+
+    We compute the frequency evolution across the band between `f_lo` and `f_hi` at
+    `nfreq` centre frequencies. The total profile is then the weighted sum over the
+    finite frequency grid. Ideally, one would use an infinitesimally narrow grid here.
+
+    Parameters
+    ----------
+    x: ~np.array
+        The running variable (time).
+    fluence: float
+        The fluence of the pulse, i.e. the area under it.
+    center: float
+        The mean of the Gaussian, i.e. its location.
+    sigma: float
+        The Gaussian standard deviation.
+    taus: float
+        The scattering time.
+    dc: float
+        The vertical offset of the profile from the baseline.
+    f_lo: float
+        The centre frequency of the lowest channel in the sub-band.
+    f_hi: float
+        The centre frequency of the highest channel in the sub-band.
+    nfreq: int
+        The number of centre frequencies to evaluate.
+
+    Returns
+    -------
+    res: ~np.array
+        The profile data, in the dtype of `x`.
+    """
+
+    band_cfreq = 0.5 * (f_lo + f_hi)
+    invband_cfreq = 1.0 / band_cfreq
+
+    # the low-frequency profiles dominate the total band-integrated
+    # profile because of the strong fluence power law scaling
+    # use finer steps towards the low-frequency band edge
+    delta = math.log10(f_hi) - math.log10(f_lo)
+    step = 10.0 ** (delta / (nfreq - 1.0))
+
+    profile = np.zeros_like(x)
+
+    for i in range(nfreq):
+        cfreq_i = f_lo * step**i
+        fluence_i = fluence * (cfreq_i * invband_cfreq) ** -1.5
+        taus_i = taus * (cfreq_i * invband_cfreq) ** -4.0
+
+        scatpulse_tmp = scattered_gaussian_pulse(
+            x, fluence_i, center, sigma, taus_i, 0.0
+        )
+
+        # accumulate
+        for j in range(x.size):
+            profile[j] = profile[j] + scatpulse_tmp[j]
+
+    # normalise to match input fluence
+    tot_fluence = 0.0
+    for j in range(x.size):
+        tot_fluence = tot_fluence + profile[j]
+
+    tot_fluence = tot_fluence * abs(x[0] - x[1])
+    A = fluence / tot_fluence
+
+    for j in range(x.size):
+        profile[j] = dc + A * profile[j]
+
+    return profile
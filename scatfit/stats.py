@@ -0,0 +1,42 @@
+#
+#   Statistics helper functions.
+#   2026 Fabian Jankowski
+#
+
+import numpy as np
+
+
+def fast_quantiles(data, quantiles):
+    """
+    Compute approximate quantiles using a partial sort.
+
+    We select the order statistics nearest to the requested quantiles using
+    `np.partition`, which runs in linear time, instead of fully sorting the
+    data like `np.quantile` does. No interpolation between neighbouring order
+    statistics is performed, i.e. the values returned are actual elements of
+    the input data. For the data sizes typical here (thousands of samples),
+    the difference to the interpolated quantiles is negligible.
+
+    Parameters
+    ----------
+    data: ~np.array
+        The input data. Multi-dimensional data are flattened.
+    quantiles: list of float
+        The quantiles to compute, each in the range [0, 1].
+
+    Returns
+    -------
+    res: ~np.array
+        The quantile values, in the order requested.
+    """
+
+    flat = np.ravel(data)
+
+    indices = np.clip(
+        (np.asarray(quantiles) * flat.size).astype(int), 0, flat.size - 1
+    )
+
+    part = np.partition(flat, indices)
+    res = part[indices]
+
+    return res
@@ -39,6 +39,7 @@ setup(
         "lmfit",
         "matplotlib",
         "mtcutils @ git+https://bitbucket.org/jankowsk/mtcutils.git@master",
+        "numba",
         "numpy",
         "pandas",
         "scipy",
@@ -87,6 +87,48 @@ def test_agreement_analytical_and_full_convolution_model():
                     assert np.all(rel_residual < 0.07)
 
 
+def test_single_precision_input():
+    """
+    Check that the models preserve single-precision input data and
+    agree with the double-precision evaluation.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+    plot_range_f32 = plot_range.astype(np.float32)
+
+    curve = pulsemodels.gaussian_normed(plot_range, 5.0, 1.2, 2.5)
+    curve_f32 = pulsemodels.gaussian_normed(plot_range_f32, 5.0, 1.2, 2.5)
+
+    assert curve_f32.dtype == np.float32
+    assert np.allclose(curve, curve_f32, atol=1e-5)
+
+    # use a small taus, so that the exponential argument gets large.
+    # the overflow guard exceeds single-precision range, i.e. this
+    # checks that the computation happens in double precision
+    for taus in [0.5, 6.0]:
+        curve = pulsemodels.scattered_gaussian_pulse(
+            plot_range, 5.0, 1.2, 2.5, taus, 0.1
+        )
+        curve_f32 = pulsemodels.scattered_gaussian_pulse(
+            plot_range_f32, 5.0, 1.2, 2.5, taus, 0.1
+        )
+
+        assert curve_f32.dtype == np.float32
+        assert np.all(np.isfinite(curve_f32))
+        assert np.allclose(curve, curve_f32, atol=1e-5)
+
+    curve = pulsemodels.bandintegrated_model(
+        plot_range, 5.0, 1.2, 2.5, 6.0, 0.1, 856.0, 1712.0, 9
+    )
+    curve_f32 = pulsemodels.bandintegrated_model(
+        plot_range_f32, 5.0, 1.2, 2.5, 6.0, 0.1, 856.0, 1712.0, 9
+    )
+
+    # the sum over the frequency grid accumulates in single precision
+    assert curve_f32.dtype == np.float32
+    assert np.allclose(curve, curve_f32, atol=1e-4)
+
+
 if __name__ == "__main__":
     import pytest
 
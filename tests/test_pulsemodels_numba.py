@@ -0,0 +1,157 @@
+import numpy as np
+
+import scatfit.pulsemodels_python as pm_python
+import scatfit.pulsemodels_numba as pm_numba
+
+
+def test_agreement_python_and_numba_models_gaussian():
+    """
+    Check that the Python and Numba implementations match.
+    Normed Gaussian.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+
+    # gaussian
+    python_model = pm_python.gaussian_normed
+    numba_model = pm_numba.gaussian_normed
+
+    for fluence in np.geomspace(0.1, 1000.0, num=10):
+        for center in np.linspace(-100.0, 100.0, num=10):
+            for sigma in np.geomspace(2.0, 50.0, num=10):
+                curve_python = python_model(plot_range, fluence, center, sigma)
+                curve_numba = numba_model(plot_range, fluence, center, sigma)
+
+                # ensure that curves differ little
+                assert np.allclose(curve_python, curve_numba)
+
+
+def test_agreement_python_and_numba_models_scattered_pulse():
+    """
+    Check that the Python and Numba implementations match.
+    Scattered Gaussian pulse.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+
+    # scattered gaussian pulse
+    python_model = pm_python.scattered_gaussian_pulse
+    numba_model = pm_numba.scattered_gaussian_pulse
+
+    for fluence in np.geomspace(0.1, 1000.0, num=5):
+        for center in np.linspace(-100.0, 100.0, num=5):
+            for sigma in np.geomspace(2.0, 50.0, num=5):
+                for taus in np.geomspace(1.0, 50.0, num=5):
+                    for dc in np.linspace(-0.5, 0.5, num=3):
+                        curve_python = python_model(
+                            plot_range, fluence, center, sigma, taus, dc
+                        )
+                        curve_numba = numba_model(
+                            plot_range, fluence, center, sigma, taus, dc
+                        )
+
+                        # ensure that curves differ little
+                        assert np.allclose(curve_python, curve_numba)
+
+
+def test_agreement_python_and_numba_models_bandintegrated():
+    """
+    Check that the Python and Numba implementations match.
+    Band-integrated model.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+
+    # bandintegrated model
+    python_model = pm_python.bandintegrated_model
+    numba_model = pm_numba.bandintegrated_model
+
+    f_lo = 856.0
+    f_hi = 1712.0
+    nfreq = 9
+
+    for fluence in np.geomspace(0.1, 1000.0, num=5):
+        for center in np.linspace(-100.0, 100.0, num=5):
+            for sigma in np.geomspace(2.0, 50.0, num=5):
+                for taus in np.geomspace(1.0, 50.0, num=5):
+                    for dc in np.linspace(-0.5, 0.5, num=3):
+                        curve_python = python_model(
+                            plot_range,
+                            fluence,
+                            center,
+                            sigma,
+                            taus,
+                            dc,
+                            f_lo,
+                            f_hi,
+                            nfreq,
+                        )
+                        curve_numba = numba_model(
+                            plot_range,
+                            fluence,
+                            center,
+                            sigma,
+                            taus,
+                            dc,
+                            f_lo,
+                            f_hi,
+                            nfreq,
+                        )
+
+                        # ensure that curves differ little
+                        assert np.allclose(curve_python, curve_numba)
+
+
+def test_agreement_python_and_numba_fill_kernels():
+    """
+    Check that the Python and Numba implementations match.
+    Boxcar and pulse broadening function fill kernels.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+
+    for width in np.geomspace(0.1, 100.0, num=10):
+        curve_python = pm_python.boxcar_fill(plot_range, width)
+        curve_numba = pm_numba.boxcar_fill(plot_range, width)
+
+        # ensure that curves differ little
+        assert np.allclose(curve_python, curve_numba)
+
+    for taus in np.geomspace(0.1, 100.0, num=10):
+        curve_python = pm_python.pbf_isotropic_fill(plot_range, taus)
+        curve_numba = pm_numba.pbf_isotropic_fill(plot_range, taus)
+
+        # ensure that curves differ little
+        assert np.allclose(curve_python, curve_numba)
+
+
+def test_agreement_python_and_numba_width_measures():
+    """
+    Check that the Python and Numba implementations match.
+    Equivalent width and full width post scattering.
+    """
+
+    plot_range = np.linspace(-1000.0, 1000.0, num=8000)
+
+    for sigma in np.geomspace(2.0, 50.0, num=5):
+        for taus in np.geomspace(1.0, 50.0, num=5):
+            amp = pm_python.scattered_gaussian_pulse(
+                plot_range, 5.0, 0.0, sigma, taus, 0.0
+            )
+
+            assert np.allclose(
+                pm_python.equivalent_width(plot_range, amp),
+                pm_numba.equivalent_width(plot_range, amp),
+            )
+
+            for level in [0.1, 0.5]:
+                assert np.allclose(
+                    pm_python.full_width_post(plot_range, amp, level),
+                    pm_numba.full_width_post(plot_range, amp, level),
+                )
+
+
+if __name__ == "__main__":
+    import pytest
+
+    pytest.main([__file__])
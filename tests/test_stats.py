@@ -0,0 +1,43 @@
+import numpy as np
+
+import scatfit.stats as stats
+
+
+def test_fast_quantiles_agreement():
+    """
+    Check that the partition-based quantiles agree with `np.quantile`.
+    """
+
+    rng = np.random.default_rng(seed=42)
+
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+    for size in [1000, 8192, 65536]:
+        data = rng.normal(loc=0.0, scale=1.0, size=size)
+
+        fast = stats.fast_quantiles(data, quantiles)
+        exact = np.quantile(data, q=quantiles)
+
+        # ensure that values differ little
+        assert np.allclose(fast, exact, atol=0.05)
+
+
+def test_fast_quantiles_elements():
+    """
+    Check that the quantile values are actual elements of the input data.
+    """
+
+    rng = np.random.default_rng(seed=42)
+
+    data = rng.uniform(low=-10.0, high=10.0, size=512)
+
+    fast = stats.fast_quantiles(data, [0.0, 0.25, 0.75, 1.0])
+
+    assert np.all(np.isin(fast, data))
+    assert np.all(np.diff(fast) >= 0)
+
+
+if __name__ == "__main__":
+    import pytest
+
+    pytest.main([__file__])